@@ -1,14 +1,24 @@
-from flask import Flask, request, jsonify
-from flask_cors import CORS
+from quart import Quart, request, jsonify
+from quart.json.provider import JSONProvider
+from quart_cors import cors
+import asyncio
+import atexit
 import logging
 import os
+import gzip
+import threading
 import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+import orjson
+from diskcache import Cache
 
 from youtube_processor import YouTubeProcessor
 from audio_emotion_detector import AudioEmotionDetector
-from emotion_detector import EmotionDetector
+from emotion_detector import EmotionDetector, NoFacesDetectedError
 from text_sentiment_analyzer import TextSentimentAnalyzer
 from multimodal_fusion import MultimodalFusion
+import gemini_client
 
 # Configure logging
 logging.basicConfig(
@@ -17,18 +27,114 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-app = Flask(__name__, static_folder='static')
-CORS(app)  # Enable CORS for all routes
+class ORJSONProvider(JSONProvider):
+    """JSON provider using orjson (also serializes numpy values in model results)"""
+    
+    OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+    
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, option=self.OPTIONS).decode('utf-8')
+    
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+app = Quart(__name__, static_folder='static')
+app.json = ORJSONProvider(app)
+app = cors(app, allow_origin='*')  # Enable CORS for all routes
+
+# Persistent cache for transcripts and analysis results (keyed by video ID)
+cache = Cache('.cache')
+TRANSCRIPT_CACHE_EXPIRE = 86400  # 1 day
+RESULT_CACHE_EXPIRE = 604800  # 1 week
+
+# Send transcript, audio and frames to Gemini in one request instead of
+# running the local video/audio models (MULTIMODAL_API_MODE=1)
+MULTIMODAL_API_MODE = os.environ.get('MULTIMODAL_API_MODE') == '1'
+MULTIMODAL_API_WEIGHTS = {'text': 1.0, 'video': 0.0, 'audio': 0.0}
 
-# Initialize processors (lazy loading)
+# Stream decoded video frames from YouTube into the video model instead of
+# downloading the video file (STREAM_VIDEO_FRAMES=1, local model path only)
+STREAM_VIDEO_FRAMES = os.environ.get('STREAM_VIDEO_FRAMES') == '1'
+
+# Results from different analysis modes are cached separately
+if MULTIMODAL_API_MODE:
+    ANALYSIS_MODE = 'multimodal_api'
+elif STREAM_VIDEO_FRAMES:
+    ANALYSIS_MODE = 'local_stream'
+else:
+    ANALYSIS_MODE = 'local'
+
+# Temp files are deleted in the background so responses are not delayed;
+# pending deletions are finished on shutdown
+cleanup_pool = ThreadPoolExecutor(max_workers=2)
+atexit.register(cleanup_pool.shutdown, wait=True)
+
+# Neutral results used when a single modality fails
+FALLBACK_TEXT_RESULT = {
+    'dominant_emotion': 'neutral',
+    'confidence_scores': {'neutral': 100.0},
+    'reasoning': 'Text analysis unavailable'
+}
+FALLBACK_VIDEO_RESULT = {
+    'dominant_emotion': 'neutral',
+    'emotion_distribution': {},
+    'total_frames_processed': 0
+}
+FALLBACK_AUDIO_RESULT = {
+    'dominant_emotion': 'neutral',
+    'confidence_scores': {'neutral': 100.0}
+}
+
+# Processors (initialized at startup by initialize_processors)
 youtube_processor = None
 audio_detector = None
 video_detector = None
 text_analyzer = None
 fusion_engine = None
 
+def get_modality_result(result, modality, fallback):
+    """Return a modality analysis result, falling back to a neutral result on failure"""
+    if isinstance(result, BaseException):
+        logger.warning(f"{modality} analysis failed, using neutral fallback: {str(result)}")
+        return dict(fallback)
+    return result
+
+def is_transient_failure(result):
+    """Whether a modality result is an error that may not recur (so must not be cached)"""
+    return isinstance(result, BaseException) and not isinstance(result, NoFacesDetectedError)
+
+async def analyze_with_multimodal_api(transcript, video_path, audio_path):
+    """Analyze all modalities with one Gemini request (None if the API call fails)"""
+    try:
+        frame_jpegs, audio_bytes = await asyncio.gather(
+            asyncio.to_thread(video_detector.extract_frame_jpegs, video_path),
+            asyncio.to_thread(audio_detector.load_audio_bytes, audio_path)
+        )
+        return await text_analyzer.analyze_multimodal(transcript, audio_bytes, frame_jpegs)
+    except Exception as e:
+        logger.warning(f"Multimodal API analysis failed, using local models: {str(e)}")
+        return None
+
+def analyze_streamed_video(youtube_url, info, stop_event):
+    """Analyze facial emotions on frames streamed straight from YouTube until stop_event is set"""
+    frames = youtube_processor.stream_video_frames(youtube_url, info)
+    return video_detector.process_video_from_array(frames, stop_event)
+
+def get_cached_transcript(youtube_url, video_id, info=None):
+    """Get transcript from the disk cache, fetching and caching it on a miss"""
+    key = f'transcript:{video_id}'
+    compressed = cache.get(key)
+    if compressed is not None:
+        logger.info(f"Using cached transcript for: {video_id}")
+        return gzip.decompress(compressed).decode('utf-8')
+    
+    transcript = youtube_processor.get_transcript(youtube_url, info)
+    if transcript:
+        cache.set(key, gzip.compress(transcript.encode('utf-8')), expire=TRANSCRIPT_CACHE_EXPIRE)
+    return transcript
+
 def initialize_processors():
-    """Initialize all processors (called on first request)"""
+    """Initialize all processors (called once at startup, before serving requests)"""
     global youtube_processor, audio_detector, video_detector, text_analyzer, fusion_engine
     
     if youtube_processor is None:
@@ -40,13 +146,20 @@ def initialize_processors():
         fusion_engine = MultimodalFusion()
         logger.info("✅ All processors initialized")
 
+@app.before_serving
+async def startup():
+    """Load all models before accepting requests"""
+    await asyncio.to_thread(initialize_processors)
+    # Warm up the Gemini connection in the background
+    app.add_background_task(gemini_client.warm_up)
+
 @app.route('/')
-def index():
+async def index():
     """Serve the HTML interface"""
-    return app.send_static_file('index.html')
+    return await app.send_static_file('index.html')
 
 @app.route('/health', methods=['GET'])
-def health_check():
+async def health_check():
     """Health check endpoint"""
     return jsonify({
         'status': 'healthy',
@@ -54,16 +167,14 @@ def health_check():
     }), 200
 
 @app.route('/analyze', methods=['POST'])
-def analyze_youtube_video():
+async def analyze_youtube_video():
     """
     Main endpoint for analyzing YouTube videos
     Expected JSON: {"youtube_url": "https://youtube.com/watch?v=..."}
     """
     try:
-        initialize_processors()
-        
         # Get YouTube URL from request
-        data = request.get_json()
+        data = await request.get_json()
         if not data or 'youtube_url' not in data:
             return jsonify({
                 'error': 'Missing youtube_url in request body'
@@ -72,49 +183,102 @@ def analyze_youtube_video():
         youtube_url = data['youtube_url']
         logger.info(f"Processing YouTube URL: {youtube_url}")
         
+        # Return cached result if this video was already analyzed
+        cache_video_id = youtube_processor._extract_video_id(youtube_url)
+        if cache_video_id != "unknown":
+            cached_response = await asyncio.to_thread(cache.get, f'result:{ANALYSIS_MODE}:{cache_video_id}')
+            if cached_response is not None:
+                logger.info(f"✅ Returning cached result for: {cache_video_id}")
+                return jsonify(cached_response), 200
+        
         video_id = None
+        video_task = None
+        stop_streaming = threading.Event()
         try:
             # Step 1: Download video and extract audio
             logger.info("Step 1: Downloading video and extracting audio...")
-            download_info = youtube_processor.download_video(youtube_url)
+            # The multimodal API mode needs the video file for frame sampling
+            stream_frames = STREAM_VIDEO_FRAMES and not MULTIMODAL_API_MODE
+            info = None
+            if stream_frames:
+                # Resolve the video once, then analyze streamed frames while the audio downloads
+                info = await asyncio.to_thread(youtube_processor.fetch_info, youtube_url)
+                video_task = asyncio.ensure_future(
+                    asyncio.to_thread(analyze_streamed_video, youtube_url, info, stop_streaming)
+                )
+            download_info = await asyncio.to_thread(
+                youtube_processor.download_video, youtube_url, include_video=not stream_frames, info=info
+            )
             video_path = download_info['video_path']
             audio_path = download_info['audio_path']
             video_id = download_info['video_id']
             
         except Exception as download_error:
             logger.error(f"Error downloading video: {str(download_error)}")
+            if video_task is not None:
+                # Cancelling the task would not stop its worker thread; signal it instead,
+                # which also stops the streaming subprocesses, and wait for it to finish
+                stop_streaming.set()
+                await asyncio.gather(video_task, return_exceptions=True)
             raise
         
         try:
             # Step 2: Extract transcript
             logger.info("Step 2: Extracting transcript...")
-            transcript = youtube_processor.get_transcript(youtube_url)
+            transcript = await asyncio.to_thread(
+                get_cached_transcript, youtube_url, video_id, download_info.get('info')
+            )
             if not transcript:
                 transcript = download_info.get('description', '')
             
-            # Step 3: Analyze text sentiment
-            logger.info("Step 3: Analyzing text sentiment...")
-            text_result = text_analyzer.analyze_sentiment(transcript)
-            
-            # Step 4: Analyze video (facial emotions)
-            logger.info("Step 4: Analyzing video frames...")
-            video_result = video_detector.process_video_from_path(video_path)
+            multimodal_result = None
+            if MULTIMODAL_API_MODE:
+                logger.info("Steps 3-5: Analyzing text, video frames and audio with Gemini...")
+                multimodal_result = await analyze_with_multimodal_api(transcript, video_path, audio_path)
             
-            # Step 5: Analyze audio
-            logger.info("Step 5: Analyzing audio...")
-            audio_result = audio_detector.predict_emotion_from_path(audio_path)
+            if multimodal_result is not None:
+                # A single Gemini result covers all three modalities; it is fused
+                # on its own and reported under 'text', with no local video/audio results
+                mode = 'multimodal_api'
+                text_result = video_result = audio_result = multimodal_result
+                weights = MULTIMODAL_API_WEIGHTS
+                all_succeeded = True
+            else:
+                mode = 'local'
+                # Steps 3-5: Analyze text, video (facial emotions) and audio concurrently
+                logger.info("Steps 3-5: Analyzing text, video frames and audio...")
+                # (the Gemini call is awaited, the local models run in worker threads)
+                text_task = text_analyzer.analyze_sentiment(transcript)
+                if not stream_frames:
+                    video_task = asyncio.to_thread(video_detector.process_video_from_path, video_path)
+                audio_task = asyncio.to_thread(audio_detector.predict_emotion_from_path, audio_path)
+                results = await asyncio.gather(text_task, video_task, audio_task, return_exceptions=True)
+                
+                text_result = get_modality_result(results[0], "Text", FALLBACK_TEXT_RESULT)
+                video_result = get_modality_result(results[1], "Video", FALLBACK_VIDEO_RESULT)
+                audio_result = get_modality_result(results[2], "Audio", FALLBACK_AUDIO_RESULT)
+                weights = None
+                # Results from the local fallback of the multimodal API mode are not cached;
+                # videos without faces are, since re-running them gives the same result
+                all_succeeded = (
+                    not MULTIMODAL_API_MODE
+                    and not any(is_transient_failure(r) for r in results)
+                    and not text_result.get('failed')
+                )
             
             # Step 6: Fuse multimodal results
             logger.info("Step 6: Fusing multimodal results...")
             final_result = fusion_engine.fuse_results(
                 text_result, 
                 video_result, 
-                audio_result
+                audio_result,
+                weights
             )
             
             # Prepare response
             response = {
                 'success': True,
+                'mode': mode,
                 'video_info': {
                     'title': download_info.get('title', 'Unknown'),
                     'duration': download_info.get('duration', 0),
@@ -134,24 +298,30 @@ def analyze_youtube_video():
                         'emotion': video_result['dominant_emotion'],
                         'frames_processed': video_result.get('total_frames_processed', 0),
                         'distribution': video_result.get('emotion_distribution', {})
-                    },
+                    } if mode == 'local' else None,
                     'audio': {
                         'emotion': audio_result['dominant_emotion'],
                         'confidence': audio_result.get('confidence_scores', {}).get(audio_result['dominant_emotion'], 0)
-                    }
+                    } if mode == 'local' else None
                 },
                 'all_emotion_scores': final_result.get('emotion_scores', {})
             }
             
+            # Only cache results without transient failures
+            if video_id != "unknown" and all_succeeded:
+                await asyncio.to_thread(
+                    cache.set, f'result:{ANALYSIS_MODE}:{video_id}', response, expire=RESULT_CACHE_EXPIRE
+                )
+            
             logger.info(f"✅ Analysis complete. Final emotion: {final_result['dominant_emotion']}")
             return jsonify(response), 200
             
         finally:
-            # Clean up downloaded files
+            # Clean up downloaded files (in the background)
             if video_id:
                 try:
                     logger.info("Cleaning up temporary files...")
-                    youtube_processor.cleanup(video_id)
+                    cleanup_pool.submit(youtube_processor.cleanup, video_id)
                 except Exception as cleanup_error:
                     logger.warning(f"Error during cleanup: {str(cleanup_error)}")
         
@@ -180,16 +350,14 @@ def analyze_youtube_video():
         }), 500
 
 @app.route('/analyze-text', methods=['POST'])
-def analyze_text_only():
+async def analyze_text_only():
     """Analyze text sentiment only (for testing)"""
     try:
-        initialize_processors()
-        
-        data = request.get_json()
+        data = await request.get_json()
         if not data or 'text' not in data:
             return jsonify({'error': 'Missing text in request body'}), 400
         
-        result = text_analyzer.analyze_sentiment(data['text'])
+        result = await text_analyzer.analyze_sentiment(data['text'])
         return jsonify({
             'success': True,
             'result': result
@@ -2,6 +2,7 @@
 import tensorflow as tf
 import librosa
 import numpy as np
+import io
 import os
 import logging
 import soundfile as sf
@@ -113,6 +114,21 @@ class AudioEmotionDetector:
             logger.error(f"Error predicting emotion from path: {str(e)}")
             raise
 
+    def load_audio_bytes(self, audio_path, max_seconds=60):
+        """
+        Load up to max_seconds of mono audio as WAV bytes
+        (for sending audio to the Gemini multimodal API)
+        """
+        sample_rate = sf.info(audio_path).samplerate
+        data, sample_rate = sf.read(audio_path, frames=int(sample_rate * max_seconds))
+        # Convert to mono if stereo
+        if len(data.shape) > 1:
+            data = np.mean(data, axis=1)
+        
+        buffer = io.BytesIO()
+        sf.write(buffer, data, sample_rate, format='WAV', subtype='PCM_16')
+        return buffer.getvalue()
+
     def predict_emotion(self, audio_file):
         try:
             # Save the audio file with proper extension
@@ -11,6 +11,9 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+class NoFacesDetectedError(Exception):
+    """Raised when a video contains no detectable faces (a repeatable outcome, not a failure)"""
+
 class EmotionDetector:
     def __init__(self):
         try:
@@ -24,9 +27,9 @@ class EmotionDetector:
             logger.error(f"Error initializing EmotionDetector: {str(e)}")
             raise
 
-    def preprocess_face(self, face):
+    def preprocess_face(self, face, color_conversion=cv2.COLOR_BGR2GRAY):
         try:
-            gray_face = cv2.cvtColor(face, cv2.COLOR_BGR2GRAY)
+            gray_face = cv2.cvtColor(face, color_conversion)
             gray_face = cv2.resize(gray_face, (48, 48), interpolation=cv2.INTER_AREA)
             roi = gray_face.astype('float') / 255.0
             roi = img_to_array(roi)
@@ -36,6 +39,70 @@ class EmotionDetector:
             logger.error(f"Error processing face: {str(e)}")
             return None
 
+    def _detect_frame_emotions(self, rgb_frame, frame_number, color_conversion=cv2.COLOR_RGB2GRAY, face_frame=None):
+        """
+        Detect faces in a frame and classify their emotions
+        face_frame is the frame faces are cropped from (defaults to rgb_frame)
+        """
+        if face_frame is None:
+            face_frame = rgb_frame
+
+        emotion_data = []
+        faces = self.detector.detect_faces(rgb_frame)
+
+        for face in faces:
+            x, y, w, h = face['box']
+            confidence = face['confidence']
+
+            if confidence < 0.95:
+                continue
+
+            face_roi = face_frame[y:y + h, x:x + w]
+            roi = self.preprocess_face(face_roi, color_conversion)
+
+            if roi is None:
+                continue
+
+            predictions = self.classifier.predict(roi)[0]
+            emotions_with_scores = {
+                self.emotion_labels[i]: float(predictions[i] * 100) 
+                for i in range(len(self.emotion_labels))
+            }
+            dominant_emotion = max(emotions_with_scores, key=emotions_with_scores.get)
+            confidence_score = emotions_with_scores[dominant_emotion]
+
+            emotion_data.append({
+                'frame': frame_number,
+                'emotion': dominant_emotion,
+                'confidence': round(confidence_score, 2)
+            })
+
+        return emotion_data
+
+    def _summarize_emotions(self, emotion_data):
+        """Aggregate per-face emotions into the video result"""
+        if emotion_data:
+            # Convert to DataFrame for analysis
+            df = pd.DataFrame(emotion_data)
+            emotion_counts = df['emotion'].value_counts()
+            most_frequent_emotion = emotion_counts.index[0]
+            
+            results = {
+                'dominant_emotion': most_frequent_emotion,
+                'occurrence_count': int(emotion_counts[most_frequent_emotion]),
+                'emotion_distribution': {
+                    emotion: int(count) 
+                    for emotion, count in emotion_counts.items()
+                },
+                'total_frames_processed': len(emotion_data)
+            }
+            
+            logger.info(f"Video processing results: {results}")
+            return results
+        else:
+            logger.warning("No faces detected in the video")
+            raise NoFacesDetectedError("No faces detected in the video")
+
     def process_video_from_path(self, video_path):
         """
         Process video from file path (for YouTube processing)
@@ -48,7 +115,6 @@ class EmotionDetector:
             frame_skip = 60  # Process every 5th frame
             frame_count = 0
             emotion_data = []
-            emotions_with_scores = {}
             
             while cap.isOpened():
                 ret, frame = cap.read()
@@ -61,57 +127,11 @@ class EmotionDetector:
 
                 # Convert frame to RGB
                 rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                faces = self.detector.detect_faces(rgb_frame)
-
-                for face in faces:
-                    x, y, w, h = face['box']
-                    confidence = face['confidence']
-
-                    if confidence < 0.95:
-                        continue
-
-                    face_roi = frame[y:y + h, x:x + w]
-                    roi = self.preprocess_face(face_roi)
-
-                    if roi is None:
-                        continue
-
-                    predictions = self.classifier.predict(roi)[0]
-                    emotions_with_scores = {
-                        self.emotion_labels[i]: float(predictions[i] * 100) 
-                        for i in range(len(self.emotion_labels))
-                    }
-                    dominant_emotion = max(emotions_with_scores, key=emotions_with_scores.get)
-                    confidence_score = emotions_with_scores[dominant_emotion]
-
-                    emotion_data.append({
-                        'frame': frame_count,
-                        'emotion': dominant_emotion,
-                        'confidence': round(confidence_score, 2)
-                    })
-
-            # Process results
-            if emotion_data:
-                # Convert to DataFrame for analysis
-                df = pd.DataFrame(emotion_data)
-                emotion_counts = df['emotion'].value_counts()
-                most_frequent_emotion = emotion_counts.index[0]
-                
-                results = {
-                    'dominant_emotion': most_frequent_emotion,
-                    'occurrence_count': int(emotion_counts[most_frequent_emotion]),
-                    'emotion_distribution': {
-                        emotion: int(count) 
-                        for emotion, count in emotion_counts.items()
-                    },
-                    'total_frames_processed': len(emotion_data)
-                }
-                
-                logger.info(f"Video processing results: {results}")
-                return results
-            else:
-                logger.warning("No faces detected in the video")
-                raise Exception("No faces detected in the video")
+                emotion_data.extend(self._detect_frame_emotions(
+                    rgb_frame, frame_count, cv2.COLOR_BGR2GRAY, face_frame=frame
+                ))
+
+            return self._summarize_emotions(emotion_data)
 
         except Exception as e:
             logger.error(f"Error during video processing: {str(e)}")
@@ -120,6 +140,59 @@ class EmotionDetector:
             if 'cap' in locals():
                 cap.release()
 
+    def process_video_from_array(self, frames, stop_event=None):
+        """
+        Process already-sampled RGB frames, e.g. from YouTubeProcessor.stream_video_frames
+        frames: any iterable of (height, width, 3) uint8 arrays (an (N, height, width, 3)
+        array or a generator); frames are analyzed as they arrive
+        stop_event: optional threading.Event; once set, processing stops before the next frame
+        """
+        try:
+            emotion_data = []
+            for frame_number, rgb_frame in enumerate(frames, start=1):
+                if stop_event is not None and stop_event.is_set():
+                    raise Exception("Video processing was stopped")
+                emotion_data.extend(self._detect_frame_emotions(rgb_frame, frame_number))
+
+            return self._summarize_emotions(emotion_data)
+
+        except Exception as e:
+            logger.error(f"Error during video processing: {str(e)}")
+            raise
+        finally:
+            # Stop a frame generator (and its subprocesses) if processing failed or was stopped midway
+            if hasattr(frames, 'close'):
+                frames.close()
+
+    def extract_frame_jpegs(self, video_path, max_frames=8):
+        """
+        Sample evenly spaced frames from a video file as JPEG bytes
+        (for sending frames to the Gemini multimodal API)
+        """
+        cap = cv2.VideoCapture(video_path)
+        try:
+            if not cap.isOpened():
+                raise Exception("Could not open video file")
+
+            total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+            step = max(total_frames // max_frames, 1)
+            frame_jpegs = []
+            for index in range(0, max(total_frames, 1), step):
+                cap.set(cv2.CAP_PROP_POS_FRAMES, index)
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                ok, buffer = cv2.imencode('.jpg', frame)
+                if ok:
+                    frame_jpegs.append(buffer.tobytes())
+                if len(frame_jpegs) >= max_frames:
+                    break
+
+            logger.info(f"Sampled {len(frame_jpegs)} frames from video")
+            return frame_jpegs
+        finally:
+            cap.release()
+
     def process_video(self, video_file):
         # Save uploaded file temporarily
         temp_path = "temp_video.mp4"
@@ -1,12 +1,4 @@
-import os
-import google.genai as genai
-from dotenv import load_dotenv
-
-# Load environment variables
-load_dotenv()
-
-# Create Gemini client (NEW SDK way)
-client = genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
+from gemini_client import client
 
 EMOTIONS = {
     "Neutral": "Let's do something fun! Would you like to play a quick game, hear an interesting fact, or get a fun challenge?",
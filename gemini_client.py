@@ -0,0 +1,24 @@
+import os
+import logging
+import google.genai as genai
+from dotenv import load_dotenv
+
+logger = logging.getLogger(__name__)
+
+# Load environment variables
+load_dotenv()
+
+# Shared Gemini client so all modules reuse the same connection pool
+# (None when GEMINI_API_KEY is not configured)
+api_key = os.getenv("GEMINI_API_KEY")
+client = genai.Client(api_key=api_key) if api_key else None
+
+async def warm_up(model="gemini-2.0-flash-exp"):
+    """Open the async client's connection ahead of the first real request"""
+    if client is None:
+        return
+    try:
+        await client.aio.models.get(model=model)
+        logger.info("✅ Gemini client warmed up")
+    except Exception as e:
+        logger.warning(f"Gemini warm-up failed: {str(e)}")
@@ -8,36 +8,31 @@ class MultimodalFusion:
     Combines results from text, video, and audio emotion detection
     """
     
-    # Emotion mapping between different modalities
+    # Emotion mapping between different modalities (keys are lowercase)
+    # Audio emotions: neutral, calm, happy, sad, angry, fear, disgust, surprise
+    # Video emotions: Angry, Disgust, Fear, Happy, Neutral, Sad, Surprise
+    # Text emotions: happy, sad, angry, fear, disgust, surprise, neutral, calm
     EMOTION_MAPPING = {
-        # Audio emotions: neutral, calm, happy, sad, angry, fear, disgust, surprise
-        # Video emotions: Angry, Disgust, Fear, Happy, Neutral, Sad, Surprise
-        # Text emotions: happy, sad, angry, fear, disgust, surprise, neutral, calm
-        
-        'Angry': 'angry',
         'angry': 'angry',
-        'Disgust': 'disgust',
         'disgust': 'disgust',
         'disgusted': 'disgust',
-        'Fear': 'fear',
         'fear': 'fear',
         'fearful': 'fear',
-        'Happy': 'happy',
         'happy': 'happy',
-        'Neutral': 'neutral',
         'neutral': 'neutral',
-        'Sad': 'sad',
         'sad': 'sad',
-        'Surprise': 'surprise',
         'surprise': 'surprise',
         'surprised': 'surprise',
         'calm': 'calm',
     }
     
+    # Default modality weights for fusion
+    _DEFAULT_WEIGHTS = {'text': 0.3, 'video': 0.4, 'audio': 0.3}
+    
     def normalize_emotion(self, emotion):
         """Normalize emotion name to standard format"""
         emotion_lower = emotion.lower().strip()
-        return self.EMOTION_MAPPING.get(emotion, self.EMOTION_MAPPING.get(emotion_lower, emotion_lower))
+        return self.EMOTION_MAPPING.get(emotion_lower, emotion_lower)
     
     def fuse_results(self, text_result, video_result, audio_result, weights=None):
         """
@@ -54,7 +49,7 @@ class MultimodalFusion:
         """
         try:
             if weights is None:
-                weights = {'text': 0.3, 'video': 0.4, 'audio': 0.3}
+                weights = self._DEFAULT_WEIGHTS
             
             # Normalize emotions
             text_emotion = self.normalize_emotion(text_result.get('dominant_emotion', 'neutral'))
@@ -68,19 +63,12 @@ class MultimodalFusion:
             
             # Weighted voting
             emotion_scores = {}
-            all_emotions = set([text_emotion, video_emotion, audio_emotion])
-            
-            for emotion in all_emotions:
-                score = 0.0
-                
-                if emotion == text_emotion:
-                    score += text_confidence * weights['text']
-                if emotion == video_emotion:
-                    score += video_confidence * weights['video']
-                if emotion == audio_emotion:
-                    score += audio_confidence * weights['audio']
-                
-                emotion_scores[emotion] = score
+            for emotion, confidence, weight in (
+                (text_emotion, text_confidence, weights['text']),
+                (video_emotion, video_confidence, weights['video']),
+                (audio_emotion, audio_confidence, weights['audio']),
+            ):
+                emotion_scores[emotion] = emotion_scores.get(emotion, 0.0) + confidence * weight
             
             # Get dominant emotion
             dominant_emotion = max(emotion_scores, key=emotion_scores.get)
@@ -146,10 +134,10 @@ class MultimodalFusion:
         emotion_dist = result.get('emotion_distribution', {})
         total = result.get('total_frames_processed', 1)
         
-        # Normalize emotion name for matching
-        for key, value in emotion_dist.items():
-            if self.normalize_emotion(key) == emotion:
-                return value / total if total > 0 else 0.0
+        # Normalize emotion names once for matching
+        normalized_dist = {self.normalize_emotion(key): value for key, value in emotion_dist.items()}
+        if emotion in normalized_dist:
+            return normalized_dist[emotion] / total if total > 0 else 0.0
         
         return 0.5  # Default confidence
 
@@ -1,31 +1,113 @@
-import os
-import google.genai as genai
-from dotenv import load_dotenv
 import logging
 import json
 import re
+import orjson
+from types import MappingProxyType
+
+from google.genai import types
+
+from gemini_client import client
 
 logger = logging.getLogger(__name__)
 
-# Load environment variables
-load_dotenv()
+EMOTION_LIST = ("happy", "sad", "angry", "fear", "disgust", "surprise", "neutral", "calm")
+# Read-only template for per-call confidence scores
+_ZERO_EMOTIONS = MappingProxyType({e: 0.0 for e in EMOTION_LIST})
+
+# Sentence ends: ASCII punctuation followed by whitespace, or CJK punctuation
+_SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?])\s+|(?<=[。！？])\s*')
+# VTT timestamps ("00:00:01.000 --> 00:00:03.500") and the cue numbers directly above them
+_VTT_TIMESTAMP = re.compile(r'(?:\d{1,2}:)?\d{2}:\d{2}[.,]\d{3}(?:\s*-->\s*(?:\d{1,2}:)?\d{2}:\d{2}[.,]\d{3})?')
+_VTT_CUE_NUMBER = re.compile(
+    r'^[ \t]*\d+[ \t]*\r?\n(?=[ \t]*(?:\d{1,2}:)?\d{2}:\d{2}[.,]\d{3}[ \t]*-->)', re.MULTILINE
+)
+
+def _window(text, start, end):
+    """
+    Return text[start:end] trimmed to whole sentences, or to whole words if no
+    sentence fits, or cut at the raw character positions if there are no spaces
+    """
+    chunk = text[start:end]
+    if start > 0:
+        match = _SENTENCE_BOUNDARY.search(chunk)
+        space = chunk.find(' ')
+        if match and match.end() < len(chunk) // 2:
+            chunk = chunk[match.end():]
+        elif 0 <= space < len(chunk) // 2:
+            chunk = chunk[space + 1:]
+    if end < len(text):
+        boundaries = [match.start() for match in _SENTENCE_BOUNDARY.finditer(chunk)]
+        space = chunk.rfind(' ')
+        if boundaries and boundaries[-1] > len(chunk) // 2:
+            chunk = chunk[:boundaries[-1]]
+        elif space > len(chunk) // 2:
+            chunk = chunk[:space]
+    return chunk.strip()
+
+def _condense(text, budget=2000):
+    """
+    Fit text into budget characters by keeping sentences from its beginning,
+    middle and end (joined with "... "), after stripping leftover VTT timestamps
+    """
+    text = _VTT_TIMESTAMP.sub('', _VTT_CUE_NUMBER.sub('', text))
+    text = ' '.join(text.split())
+    if len(text) <= budget:
+        return text
+    
+    separator = '... '
+    part = (budget - 2 * len(separator)) // 3
+    middle = (len(text) - part) // 2
+    parts = [
+        _window(text, 0, part),
+        _window(text, middle, middle + part),
+        _window(text, len(text) - part, len(text)),
+    ]
+    return separator.join(p for p in parts if p)
+
+def _extract_json(s):
+    """Return the first balanced {...} object in s (or s itself if none is found)"""
+    start = s.find('{')
+    if start == -1:
+        return s
+    
+    depth = 0
+    in_string = False
+    escaped = False
+    for i in range(start, len(s)):
+        c = s[i]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif c == '\\':
+                escaped = True
+            elif c == '"':
+                in_string = False
+        elif c == '"':
+            in_string = True
+        elif c == '{':
+            depth += 1
+        elif c == '}':
+            depth -= 1
+            if depth == 0:
+                return s[start:i + 1]
+    return s
 
 class TextSentimentAnalyzer:
     def __init__(self):
         try:
-            api_key = os.getenv("GEMINI_API_KEY")
-            if not api_key:
+            if client is None:
                 raise ValueError("GEMINI_API_KEY not found in environment variables")
-            self.client = genai.Client(api_key=api_key)
+            self.client = client
             logger.info("✅ Text Sentiment Analyzer initialized")
         except Exception as e:
             logger.error(f"Error initializing TextSentimentAnalyzer: {str(e)}")
             raise
     
-    def analyze_sentiment(self, text):
+    async def analyze_sentiment(self, text):
         """
         Analyze sentiment/emotion from text using Gemini
-        Returns emotion classification
+        Returns emotion classification ("failed" is set when the API call or
+        response parsing failed and a neutral result was substituted)
         """
         try:
             if not text or len(text.strip()) < 10:
@@ -39,7 +121,7 @@ class TextSentimentAnalyzer:
             # Create prompt for emotion analysis
             prompt = f"""Analyze the sentiment and emotion of the following text from a YouTube video transcript/description.
 
-Text: {text[:2000]}  # Limit to first 2000 chars
+Text: {_condense(text)}
 
 Based on the text content, classify the dominant emotion into one of these categories:
 - happy
@@ -61,49 +143,103 @@ Respond ONLY with a JSON object in this exact format:
 Do not include any other text, only the JSON object."""
 
             # Call Gemini API
-            response = self.client.models.generate_content(
+            response = await self.client.aio.models.generate_content(
                 model="gemini-2.0-flash-exp",
                 contents=prompt
             )
             
             response_text = response.text.strip()
+            result = self._parse_emotion_response(response_text)
             
-            # Extract JSON from response (in case there's extra text)
-            json_match = re.search(r'\{[^}]+\}', response_text, re.DOTALL)
-            if json_match:
-                response_text = json_match.group(0)
-            
-            result = json.loads(response_text)
-            
-            # Normalize emotion name
-            emotion = result.get("dominant_emotion", "neutral").lower()
-            confidence = float(result.get("confidence", 0.5))
+            logger.info(f"✅ Text emotion detected: {result['dominant_emotion']} "
+                        f"(confidence: {result['confidence_scores'][result['dominant_emotion']]:.1f}%)")
             
-            # Create confidence scores for all emotions
-            confidence_scores = {e: 0.0 for e in ["happy", "sad", "angry", "fear", "disgust", "surprise", "neutral", "calm"]}
-            confidence_scores[emotion] = confidence * 100
+            return result
             
-            logger.info(f"✅ Text emotion detected: {emotion} (confidence: {confidence*100:.1f}%)")
-            
-            return {
-                "dominant_emotion": emotion,
-                "confidence_scores": confidence_scores,
-                "reasoning": result.get("reasoning", "")
-            }
-            
-        except json.JSONDecodeError as e:
+        except json.JSONDecodeError as e:  # orjson.JSONDecodeError is a subclass
             logger.error(f"Error parsing JSON response: {str(e)}")
             logger.error(f"Response was: {response_text}")
             return {
                 "dominant_emotion": "neutral",
                 "confidence_scores": {"neutral": 100.0},
-                "reasoning": "Error parsing AI response"
+                "reasoning": "Error parsing AI response",
+                "failed": True
             }
         except Exception as e:
             logger.error(f"Error analyzing text sentiment: {str(e)}")
             return {
                 "dominant_emotion": "neutral",
                 "confidence_scores": {"neutral": 100.0},
-                "reasoning": f"Error: {str(e)}"
+                "reasoning": f"Error: {str(e)}",
+                "failed": True
             }
+    
+    async def analyze_multimodal(self, transcript, audio_bytes, frame_jpegs):
+        """
+        Analyze emotion from transcript, audio and video frames in a single Gemini request
+        Returns emotion classification (raises on API or parsing errors so callers
+        can fall back to the local models)
+        """
+        prompt = f"""Analyze the emotion expressed in this YouTube video using all of the provided inputs:
+the transcript/description text, the attached audio track and the attached video frames.
 
+Text: {_condense(transcript) if transcript else "(no transcript available)"}
+
+Based on the combined text, voice and facial expressions, classify the dominant emotion into one of these categories:
+- happy
+- sad
+- angry
+- fear
+- disgust
+- surprise
+- neutral
+- calm
+
+Respond ONLY with a JSON object in this exact format:
+{{
+    "dominant_emotion": "emotion_name",
+    "confidence": 0.0-1.0,
+    "reasoning": "brief explanation"
+}}
+
+Do not include any other text, only the JSON object."""
+
+        contents = [prompt]
+        if audio_bytes:
+            contents.append(types.Part.from_bytes(data=audio_bytes, mime_type='audio/wav'))
+        contents.extend(
+            types.Part.from_bytes(data=frame, mime_type='image/jpeg')
+            for frame in frame_jpegs
+        )
+        
+        # Call Gemini API
+        response = await self.client.aio.models.generate_content(
+            model="gemini-2.5-flash",
+            contents=contents
+        )
+        
+        result = self._parse_emotion_response(response.text.strip())
+        logger.info(f"✅ Multimodal emotion detected: {result['dominant_emotion']} "
+                    f"(confidence: {result['confidence_scores'][result['dominant_emotion']]:.1f}%)")
+        return result
+    
+    def _parse_emotion_response(self, response_text):
+        """Parse Gemini's JSON reply into dominant emotion and confidence scores"""
+        # Extract JSON from response (in case there's extra text)
+        response_text = _extract_json(response_text)
+        
+        result = orjson.loads(response_text)
+        
+        # Normalize emotion name
+        emotion = result.get("dominant_emotion", "neutral").lower()
+        confidence = float(result.get("confidence", 0.5))
+        
+        # Create confidence scores for all emotions
+        confidence_scores = dict(_ZERO_EMOTIONS)
+        confidence_scores[emotion] = confidence * 100
+        
+        return {
+            "dominant_emotion": emotion,
+            "confidence_scores": confidence_scores,
+            "reasoning": result.get("reasoning", "")
+        }
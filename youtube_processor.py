@@ -1,19 +1,65 @@
 import os
+import re
+import copy
+import json
+import shutil
+import subprocess
+import sys
+import numpy as np
 import yt_dlp
 import logging
+import requests
+import webvtt
+from concurrent.futures import ThreadPoolExecutor
+from io import StringIO
 from pathlib import Path
 
 logger = logging.getLogger(__name__)
 
+# Shared HTTP session so subtitle downloads reuse connections
+_SESSION = requests.Session()
+_SESSION.headers['Accept-Encoding'] = 'gzip, deflate'
+
+# RAM-backed temp directory used when available (Linux tmpfs)
+TMPFS_TEMP_DIR = "/dev/shm/yt_proc"
+MIN_TMPFS_FREE_BYTES = 2 * 1024 ** 3  # 2 GB
+
+# Video ID patterns (supports regular videos and Shorts)
+_VIDEO_ID_PATTERNS = [re.compile(pattern) for pattern in [
+    r'(?:youtube\.com\/shorts\/)([0-9A-Za-z_-]{11})',  # YouTube Shorts
+    r'(?:youtube\.com\/watch\?v=)([0-9A-Za-z_-]{11})',  # Regular watch URL
+    r'(?:youtu\.be\/)([0-9A-Za-z_-]{11})',  # Short URL
+    r'(?:v=|\/)([0-9A-Za-z_-]{11}).*',  # Generic pattern
+    r'(?:embed\/)([0-9A-Za-z_-]{11})',  # Embed URL
+    r'(?:v\/)([0-9A-Za-z_-]{11})',  # Alternative format
+]]
+
 class YouTubeProcessor:
-    def __init__(self, temp_dir="temp_youtube"):
-        self.temp_dir = temp_dir
+    def __init__(self, temp_dir=None):
+        self.temp_dir = temp_dir or os.environ.get('TEMP_DIR') or self._default_temp_dir()
         os.makedirs(self.temp_dir, exist_ok=True)
+        logger.info(f"Using temp directory: {self.temp_dir}")
     
-    def download_video(self, youtube_url):
+    def _default_temp_dir(self):
+        """Use tmpfs (/dev/shm) for downloads if it has enough free space, else local disk"""
+        if os.path.isdir("/dev/shm"):
+            free_bytes = shutil.disk_usage("/dev/shm").free
+            if free_bytes >= MIN_TMPFS_FREE_BYTES:
+                return TMPFS_TEMP_DIR
+            logger.warning(f"/dev/shm has only {free_bytes / 1024 ** 3:.1f} GB free, using disk for temp files")
+        return "temp_youtube"
+    
+    def fetch_info(self, youtube_url):
+        """Resolve video info (metadata, formats, subtitles) without downloading"""
+        with yt_dlp.YoutubeDL({'quiet': True, 'no_warnings': True}) as ydl:
+            return ydl.extract_info(youtube_url, download=False, process=False)
+    
+    def download_video(self, youtube_url, include_video=True, info=None):
         """
         Download video and extract audio from YouTube URL
-        Returns paths to video and audio files
+        Returns paths to video and audio files (video_path is None when
+        include_video is False, e.g. when frames are streamed instead)
+        Pass the info dict from fetch_info to skip resolving the URL again
         """
         try:
             video_id = self._extract_video_id(youtube_url)
@@ -40,50 +86,44 @@ class YouTubeProcessor:
                 'no_warnings': True,
             }
             
-            # Download video
-            logger.info(f"Downloading video from: {youtube_url}")
-            actual_video_path = None
-            with yt_dlp.YoutubeDL(ydl_opts_video) as ydl:
-                ydl.download([youtube_url])
-                # Get the actual downloaded file path
-                info = ydl.extract_info(youtube_url, download=False)
-                downloaded_ext = info.get('ext', 'mp4')
-                actual_video_path = video_path.replace('.mp4', f'.{downloaded_ext}')
+            # Resolve video info once and share it between both downloads
+            if info is None:
+                info = self.fetch_info(youtube_url)
+            title = info.get('title', 'Unknown')
+            description = info.get('description', '')
+            duration = info.get('duration', 0)
+            
+            def _dl_video():
+                logger.info(f"Downloading video from: {youtube_url}")
+                with yt_dlp.YoutubeDL(ydl_opts_video) as ydl:
+                    result = ydl.process_ie_result(copy.deepcopy(info), download=True)
+                    actual_video_path = video_path.replace('.mp4', f".{result.get('ext', 'mp4')}")
                 if not os.path.exists(actual_video_path):
                     # Try to find the file with the video_id
-                    import glob
-                    pattern = os.path.join(self.temp_dir, f"{video_id}_video.*")
-                    matches = glob.glob(pattern)
+                    matches = self._find(f"{video_id}_video.")
                     if matches:
                         actual_video_path = matches[0]
+                return actual_video_path if os.path.exists(actual_video_path) else video_path
             
-            if actual_video_path and os.path.exists(actual_video_path):
-                video_path = actual_video_path
-            
-            # Download audio
-            logger.info("Extracting audio...")
-            actual_audio_path = None
-            with yt_dlp.YoutubeDL(ydl_opts_audio) as ydl:
-                ydl.download([youtube_url])
+            def _dl_audio():
+                logger.info("Extracting audio...")
+                with yt_dlp.YoutubeDL(ydl_opts_audio) as ydl:
+                    ydl.process_ie_result(copy.deepcopy(info), download=True)
                 # Audio should be converted to wav by postprocessor
                 actual_audio_path = audio_path
                 if not os.path.exists(actual_audio_path):
                     # Try to find the wav file
-                    import glob
-                    pattern = os.path.join(self.temp_dir, f"{video_id}_audio.*")
-                    matches = glob.glob(pattern)
+                    matches = self._find(f"{video_id}_audio.")
                     if matches:
                         actual_audio_path = matches[0]
+                return actual_audio_path
             
-            if actual_audio_path and os.path.exists(actual_audio_path):
-                audio_path = actual_audio_path
-            
-            # Get video metadata
-            with yt_dlp.YoutubeDL({'quiet': True}) as ydl:
-                info = ydl.extract_info(youtube_url, download=False)
-                title = info.get('title', 'Unknown')
-                description = info.get('description', '')
-                duration = info.get('duration', 0)
+            # Download video and audio in parallel
+            with ThreadPoolExecutor(max_workers=2) as pool:
+                video_future = pool.submit(_dl_video) if include_video else None
+                audio_future = pool.submit(_dl_audio)
+                video_path = video_future.result() if video_future else None
+                audio_path = audio_future.result()
             
             logger.info(f"✅ Video downloaded: {title}")
             
@@ -93,56 +133,62 @@ class YouTubeProcessor:
                 'title': title,
                 'description': description,
                 'duration': duration,
-                'video_id': video_id
+                'video_id': video_id,
+                'info': info
             }
             
         except Exception as e:
             logger.error(f"Error downloading video: {str(e)}")
             raise
     
-    def get_transcript(self, youtube_url):
+    def get_transcript(self, youtube_url, info=None):
         """
         Extract transcript/subtitles from YouTube video
+        Pass the info dict returned by download_video to skip resolving the URL again
         """
         try:
-            ydl_opts = {
-                'writesubtitles': True,
-                'writeautomaticsub': True,
-                'subtitleslangs': ['en'],
-                'subtitlesformat': 'vtt',
-                'skip_download': True,
-                'quiet': True,
-            }
+            if info is None:
+                ydl_opts = {
+                    'writesubtitles': True,
+                    'writeautomaticsub': True,
+                    'subtitleslangs': ['en'],
+                    'subtitlesformat': 'vtt',
+                    'skip_download': True,
+                    'quiet': True,
+                }
+                with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+                    info = ydl.extract_info(youtube_url, download=False)
             
-            transcript_text = ""
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(youtube_url, download=False)
-                
-                # Try to get manual subtitles first, then auto-generated
-                if 'subtitles' in info and 'en' in info['subtitles']:
-                    subtitle_url = info['subtitles']['en'][0]['url']
-                elif 'automatic_captions' in info and 'en' in info['automatic_captions']:
-                    subtitle_url = info['automatic_captions']['en'][0]['url']
-                else:
-                    logger.warning("No subtitles available, will use description")
-                    return info.get('description', '')
-                
-                # Download and parse VTT file
-                import urllib.request
-                import re
-                
-                vtt_content = urllib.request.urlopen(subtitle_url).read().decode('utf-8')
-                
-                # Remove VTT formatting and extract text
-                lines = vtt_content.split('\n')
-                for line in lines:
-                    # Skip timestamps and VTT metadata
-                    if '-->' in line or line.strip().startswith('<') or not line.strip():
-                        continue
-                    # Remove HTML tags
-                    line = re.sub(r'<[^>]+>', '', line)
-                    if line.strip():
-                        transcript_text += line.strip() + " "
+            # Try to get manual subtitles first, then auto-generated
+            if info.get('subtitles') and 'en' in info['subtitles']:
+                subtitle_tracks = info['subtitles']['en']
+            elif info.get('automatic_captions') and 'en' in info['automatic_captions']:
+                subtitle_tracks = info['automatic_captions']['en']
+            else:
+                logger.warning("No subtitles available, will use description")
+                return info.get('description', '')
+            
+            # Prefer the VTT track, since that is the format parsed below
+            subtitle_url = next(
+                (track['url'] for track in subtitle_tracks if track.get('ext') == 'vtt'),
+                subtitle_tracks[0]['url']
+            )
+            
+            # Download and parse VTT file
+            resp = _SESSION.get(subtitle_url, timeout=15)
+            resp.raise_for_status()
+            resp.encoding = 'utf-8'
+            vtt_content = resp.text
+            
+            # Collect caption text, skipping lines repeated by adjacent
+            # cues (auto-generated captions repeat the previous line)
+            lines = []
+            for caption in webvtt.from_buffer(StringIO(vtt_content)):
+                for line in caption.text.splitlines():
+                    line = line.strip()
+                    if line and (not lines or line != lines[-1]):
+                        lines.append(line)
+            transcript_text = ' '.join(lines)
             
             logger.info(f"✅ Transcript extracted ({len(transcript_text)} characters)")
             return transcript_text.strip()
@@ -150,6 +196,8 @@ class YouTubeProcessor:
         except Exception as e:
             logger.warning(f"Could not extract transcript: {str(e)}")
             # Fallback to description
+            if info is not None:
+                return info.get('description', '')
             try:
                 with yt_dlp.YoutubeDL({'quiet': True}) as ydl:
                     info = ydl.extract_info(youtube_url, download=False)
@@ -157,31 +205,103 @@ class YouTubeProcessor:
             except:
                 return ""
     
+    def stream_video_frames(self, youtube_url, info=None, fps=0.5, size=(640, 360)):
+        """
+        Stream video frames from YouTube without writing the video to disk
+        yt-dlp writes the video to a pipe and ffmpeg decodes it to raw RGB frames
+        (sampled at fps and letterboxed to size)
+        Yields (height, width, 3) uint8 numpy arrays one frame at a time
+        Pass the info dict from fetch_info to skip resolving the URL again
+        """
+        width, height = size
+        frame_size = width * height * 3
+        
+        info_path = None
+        if info is not None:
+            # Hand the already-resolved info to yt-dlp instead of the URL
+            info_path = os.path.join(self.temp_dir, f"{self._extract_video_id(youtube_url)}_info.json")
+            with open(info_path, 'w', encoding='utf-8') as f:
+                json.dump(yt_dlp.YoutubeDL.sanitize_info(copy.deepcopy(info), remove_private_keys=True), f)
+            source = ['--load-info-json', info_path]
+        else:
+            source = [youtube_url]
+        
+        ytdl_cmd = [
+            sys.executable, '-m', 'yt_dlp',
+            '-f', 'best[height<=720]',
+            '-o', '-',
+            '--quiet', '--no-warnings',
+            *source,
+        ]
+        ffmpeg_cmd = [
+            'ffmpeg', '-loglevel', 'error',
+            '-i', 'pipe:0',
+            '-vf', f"fps={fps},scale={width}:{height}:force_original_aspect_ratio=decrease,"
+                   f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2",
+            '-f', 'rawvideo', '-pix_fmt', 'rgb24',
+            'pipe:1',
+        ]
+        
+        logger.info(f"Streaming video frames from: {youtube_url}")
+        ytdl_proc = None
+        ffmpeg_proc = None
+        frame_count = 0
+        completed = False
+        try:
+            ytdl_proc = subprocess.Popen(ytdl_cmd, stdout=subprocess.PIPE)
+            ffmpeg_proc = subprocess.Popen(ffmpeg_cmd, stdin=ytdl_proc.stdout, stdout=subprocess.PIPE)
+            # Let yt-dlp receive SIGPIPE if ffmpeg exits early
+            ytdl_proc.stdout.close()
+            
+            while True:
+                frame = np.empty((height, width, 3), dtype=np.uint8)
+                if ffmpeg_proc.stdout.readinto(memoryview(frame).cast('B')) < frame_size:
+                    break
+                frame_count += 1
+                yield frame
+            completed = True
+        finally:
+            # Stop both processes if streaming ended early (error, spawn failure or consumer stopped)
+            for proc in (ffmpeg_proc, ytdl_proc):
+                if proc is None:
+                    continue
+                proc.stdout.close()
+                if not completed:
+                    proc.kill()
+                proc.wait()
+            if info_path and os.path.exists(info_path):
+                os.remove(info_path)
+        
+        # A failure part-way through would otherwise look like a shorter video
+        if ytdl_proc.returncode != 0 or ffmpeg_proc.returncode != 0:
+            raise Exception(
+                f"Video streaming failed (yt-dlp exit code {ytdl_proc.returncode}, "
+                f"ffmpeg exit code {ffmpeg_proc.returncode})"
+            )
+        if frame_count == 0:
+            raise Exception("No video frames could be streamed")
+        
+        logger.info(f"✅ Streamed {frame_count} video frames")
+    
     def _extract_video_id(self, url):
         """Extract video ID from YouTube URL (supports regular videos and Shorts)"""
-        import re
-        patterns = [
-            r'(?:youtube\.com\/shorts\/)([0-9A-Za-z_-]{11})',  # YouTube Shorts
-            r'(?:youtube\.com\/watch\?v=)([0-9A-Za-z_-]{11})',  # Regular watch URL
-            r'(?:youtu\.be\/)([0-9A-Za-z_-]{11})',  # Short URL
-            r'(?:v=|\/)([0-9A-Za-z_-]{11}).*',  # Generic pattern
-            r'(?:embed\/)([0-9A-Za-z_-]{11})',  # Embed URL
-            r'(?:v\/)([0-9A-Za-z_-]{11})',  # Alternative format
-        ]
-        for pattern in patterns:
-            match = re.search(pattern, url)
+        for pattern in _VIDEO_ID_PATTERNS:
+            match = pattern.search(url)
             if match:
                 return match.group(1)
         return "unknown"
     
+    def _find(self, prefix):
+        """Return paths of files in the temp directory whose names start with prefix"""
+        with os.scandir(self.temp_dir) as entries:
+            return [entry.path for entry in entries if entry.name.startswith(prefix)]
+    
     def cleanup(self, video_id):
         """Clean up temporary files"""
         try:
-            import glob
-            pattern = os.path.join(self.temp_dir, f"{video_id}_*")
-            for file in glob.glob(pattern):
-                os.remove(file)
-                logger.info(f"Cleaned up: {file}")
+            for path in self._find(f"{video_id}_"):
+                os.unlink(path)
+                logger.info(f"Cleaned up: {path}")
         except Exception as e:
             logger.warning(f"Error cleaning up files: {str(e)}")
 